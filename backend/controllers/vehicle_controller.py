@@ -18,12 +18,13 @@ class VehicleController:
             with open(csv_path, 'r', encoding='utf-8-sig') as file:
                 csv_reader = csv.DictReader(file)
                 for row in csv_reader:
-                    vehicle = Vehicle(
+                    vehicle = Vehicle.model_construct(
                         vehicle_id=row['vehicle_id'],
                         type=row['type'],
                         max_capacity_kg=int(row['max_capacity_kg']),
                         fuel_type=row['fuel_type'],
-                        emission_g_co2_per_km=int(row['emission_g_co2_per_km'])
+                        emission_g_co2_per_km=int(row['emission_g_co2_per_km']),
+                        depot_id=row.get('depot_id') or None
                     )
                     vehicles.append(vehicle)
         except FileNotFoundError:
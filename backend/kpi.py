@@ -0,0 +1,346 @@
+import json
+
+import numpy as np
+
+
+def _pad_routes(routes, depot=0):
+    """Pack variable-length node sequences into a depot-padded 2D array.
+
+    Each route is closed (ends back at its first node) so that the return leg
+    is scored too. Padding repeats the closing node, which yields zero-length
+    self arcs that do not contribute to any KPI.
+    """
+    n_routes = len(routes)
+    lengths = np.array([len(r) for r in routes], dtype=np.int64)
+    width = int(lengths.max()) + 1 if n_routes else 1
+    nodes = np.full((n_routes, width), depot, dtype=np.int64)
+    for r, seq in enumerate(routes):
+        if len(seq):
+            nodes[r, : len(seq)] = seq
+            nodes[r, len(seq):] = seq[0]
+    return nodes, lengths
+
+
+def route_kpi_arrays(
+    routes,
+    dist_matrix,
+    time_matrix,
+    demands=None,
+    capacities=None,
+    emission_factors=None,
+    window_start=None,
+    window_end=None,
+    start_time=0.0,
+):
+    """Score a set of routes with NumPy fancy indexing over consecutive stops.
+
+    routes: list of node-index sequences, one per vehicle, each starting at
+        the vehicle's depot node (the return leg is added automatically).
+    dist_matrix: (n, n) array of arc distances in metres.
+    time_matrix: (n, n) array of arc travel times in minutes.
+    demands: (n,) demand per node in kg.
+    capacities / emission_factors: per-route capacity (kg) and g CO2 per km.
+    window_start / window_end: (n,) time windows in minutes, NaN when absent.
+    Returns: dict of per-route NumPy arrays. Use `plan_kpi_arrays` to score
+    many candidate plans at once.
+    """
+    nodes, lengths = _pad_routes(routes)
+    return _score_padded(
+        nodes, lengths, dist_matrix, time_matrix, demands, capacities,
+        emission_factors, window_start, window_end, start_time,
+    )
+
+
+def _score_padded(
+    nodes,
+    lengths,
+    dist_matrix,
+    time_matrix,
+    demands,
+    capacities,
+    emission_factors,
+    window_start,
+    window_end,
+    start_time,
+):
+    dist = np.asarray(dist_matrix, dtype=np.float64)
+    tmat = np.asarray(time_matrix, dtype=np.float64)
+    n_nodes = dist.shape[0]
+    n_routes = len(lengths)
+
+    from_nodes = nodes[:, :-1]
+    to_nodes = nodes[:, 1:]
+
+    distance_km = dist[from_nodes, to_nodes].sum(axis=1) / 1000.0
+    legs = tmat[from_nodes, to_nodes]
+
+    demands = np.zeros(n_nodes) if demands is None else np.asarray(demands, dtype=np.float64)
+    # Padding repeats the first node (the depot), whose demand is zero
+    stop_demand = demands[nodes[:, :-1]]
+    load_kg = stop_demand.sum(axis=1)
+    stops = np.maximum(lengths - 1, 0)
+
+    if capacities is None:
+        utilization = np.full(n_routes, np.nan)
+    else:
+        caps = np.asarray(capacities, dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            utilization = np.where(caps > 0, load_kg / caps, np.nan)
+
+    if emission_factors is None:
+        emissions_kg = np.zeros(n_routes)
+    else:
+        emissions_kg = distance_km * np.asarray(emission_factors, dtype=np.float64) / 1000.0
+
+    # Arrival times: waiting until the window opens makes this a running max,
+    # so sweep stop positions while staying vectorised across routes.
+    w_start = np.full(n_nodes, np.nan) if window_start is None else np.asarray(window_start, dtype=np.float64)
+    w_end = np.full(n_nodes, np.nan) if window_end is None else np.asarray(window_end, dtype=np.float64)
+    opens = np.nan_to_num(w_start[nodes], nan=-np.inf)
+    closes = np.nan_to_num(w_end[nodes], nan=np.inf)
+    # Vehicles leave the depot just in time for their first window
+    first_open = opens[:, 1] - legs[:, 0] if nodes.shape[1] > 1 else np.full(n_routes, -np.inf)
+    departure = np.maximum(float(start_time), first_open)
+    clock = departure.copy()
+    lateness = np.zeros(n_routes)
+    late_stops = np.zeros(n_routes, dtype=np.int64)
+    for k in range(1, nodes.shape[1]):
+        clock = np.maximum(clock + legs[:, k - 1], opens[:, k])
+        # Only real stops count; the closing depot leg and padding do not
+        is_stop = k < lengths
+        overdue = np.where(is_stop, np.maximum(clock - closes[:, k], 0.0), 0.0)
+        lateness += overdue
+        late_stops += overdue > 0
+    duration_min = clock - departure
+
+    return {
+        "stops": stops,
+        "distance_km": distance_km,
+        "duration_min": duration_min,
+        "emissions_kg_co2": emissions_kg,
+        "load_kg": load_kg,
+        "utilization": utilization,
+        "lateness_min": lateness,
+        "late_stops": late_stops,
+    }
+
+
+def plan_kpi_arrays(
+    routes,
+    plan_ids,
+    dist_matrix,
+    time_matrix,
+    demands=None,
+    capacities=None,
+    emission_factors=None,
+    window_start=None,
+    window_end=None,
+    start_time=0.0,
+):
+    """Score many candidate plans in one vectorised pass.
+
+    routes: routes of all plans stacked together, grouped by plan.
+    plan_ids: (n_routes,) plan label per route; routes of one plan must be
+        contiguous. The other arguments are per node / per route as in
+        `route_kpi_arrays`; the node space is shared by all plans.
+    Returns: dict of per-plan NumPy arrays (fleet totals, utilization,
+    dropped_orders and dropped_kg), in order of first appearance.
+    """
+    plan_ids = np.asarray(plan_ids)
+    nodes, lengths = _pad_routes(routes)
+    arrays = _score_padded(
+        nodes, lengths, dist_matrix, time_matrix, demands, capacities,
+        emission_factors, window_start, window_end, start_time,
+    )
+    n_routes = len(lengths)
+    starts = np.flatnonzero(np.r_[True, plan_ids[1:] != plan_ids[:-1]]) if n_routes else np.zeros(0, dtype=np.int64)
+    n_plans = len(starts)
+    if n_plans == 0:
+        return {}
+
+    plans = {
+        key: np.add.reduceat(arrays[key], starts)
+        for key in ("stops", "distance_km", "duration_min", "emissions_kg_co2", "load_kg", "lateness_min", "late_stops")
+    }
+    used = arrays["stops"] > 0
+    plans["vehicles_used"] = np.add.reduceat(used.astype(np.int64), starts)
+    if capacities is None:
+        plans["utilization"] = np.full(n_plans, np.nan)
+    else:
+        used_caps = np.add.reduceat(np.where(used, np.asarray(capacities, dtype=np.float64), 0.0), starts)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            plans["utilization"] = np.where(used_caps > 0, plans["load_kg"] / used_caps, np.nan)
+
+    # Dropped orders: nodes no route of the plan visits, excluding depots
+    n_nodes = len(demands) if demands is not None else np.asarray(dist_matrix).shape[0]
+    plan_of_route = np.repeat(np.arange(n_plans), np.diff(np.r_[starts, n_routes]))
+    cols = np.arange(nodes.shape[1])
+    is_stop = (cols[None, :] >= 1) & (cols[None, :] < lengths[:, None])
+    visited = np.zeros((n_plans, n_nodes), dtype=bool)
+    visited[np.broadcast_to(plan_of_route[:, None], nodes.shape)[is_stop], nodes[is_stop]] = True
+    is_depot = np.zeros(n_nodes, dtype=bool)
+    is_depot[nodes[lengths > 0, 0]] = True
+    if not is_depot.any():
+        is_depot[0] = True
+    dropped = ~visited & ~is_depot[None, :]
+    plans["dropped_orders"] = dropped.sum(axis=1)
+    if demands is None:
+        plans["dropped_kg"] = np.zeros(n_plans)
+    else:
+        plans["dropped_kg"] = dropped @ np.asarray(demands, dtype=np.float64)
+    return plans
+
+
+def evaluate_routes(
+    routes,
+    dist_matrix,
+    time_matrix,
+    vehicle_ids=None,
+    order_ids=None,
+    demands=None,
+    capacities=None,
+    emission_factors=None,
+    window_start=None,
+    window_end=None,
+    start_time=0.0,
+):
+    """Compute per-route and fleet KPIs for a solution.
+
+    Takes the same arguments as `route_kpi_arrays`, plus optional vehicle and
+    order identifiers used for labelling. Orders whose node never appears on
+    any route are reported as dropped.
+    Returns: JSON-serialisable dict with 'routes' and 'fleet' entries.
+    """
+    arrays = route_kpi_arrays(
+        routes,
+        dist_matrix,
+        time_matrix,
+        demands=demands,
+        capacities=capacities,
+        emission_factors=emission_factors,
+        window_start=window_start,
+        window_end=window_end,
+        start_time=start_time,
+    )
+    # The matrices may cover more nodes than the orders actually being routed
+    n_nodes = len(order_ids) if order_ids is not None else np.asarray(dist_matrix).shape[0]
+    if vehicle_ids is None:
+        vehicle_ids = list(range(len(routes)))
+
+    per_route = []
+    for r, vid in enumerate(vehicle_ids):
+        util = arrays["utilization"][r]
+        per_route.append({
+            "vehicle_id": str(vid),
+            "vehicle_index": r,
+            "stops": int(arrays["stops"][r]),
+            "distance_km": round(float(arrays["distance_km"][r]), 3),
+            "duration_min": round(float(arrays["duration_min"][r]), 1),
+            "emissions_kg_co2": round(float(arrays["emissions_kg_co2"][r]), 3),
+            "load_kg": round(float(arrays["load_kg"][r]), 2),
+            "utilization": None if np.isnan(util) else round(float(util), 4),
+            "lateness_min": round(float(arrays["lateness_min"][r]), 1),
+            "late_stops": int(arrays["late_stops"][r]),
+        })
+
+    # Depots are the first node of each route; every other node is an order
+    visited = np.zeros(n_nodes, dtype=bool)
+    depots = np.zeros(n_nodes, dtype=bool)
+    for seq in routes:
+        if len(seq):
+            depots[seq[0]] = True
+            visited[np.asarray(seq[1:], dtype=np.int64)] = True
+    if not depots.any():
+        depots[0] = True
+    dropped_nodes = np.flatnonzero(~visited & ~depots)
+    if order_ids is not None:
+        dropped = [str(order_ids[i]) for i in dropped_nodes]
+    else:
+        dropped = [int(i) for i in dropped_nodes]
+    dropped_kg = 0.0 if demands is None else float(np.asarray(demands, dtype=np.float64)[dropped_nodes].sum())
+
+    used = arrays["stops"] > 0
+    total_load = float(arrays["load_kg"].sum())
+    fleet = {
+        "vehicles_used": int(used.sum()),
+        "stops": int(arrays["stops"].sum()),
+        "distance_km": round(float(arrays["distance_km"].sum()), 3),
+        "duration_min": round(float(arrays["duration_min"].sum()), 1),
+        "emissions_kg_co2": round(float(arrays["emissions_kg_co2"].sum()), 3),
+        "load_kg": round(total_load, 2),
+        "lateness_min": round(float(arrays["lateness_min"].sum()), 1),
+        "late_stops": int(arrays["late_stops"].sum()),
+        "dropped_orders": len(dropped),
+        "dropped_kg": round(dropped_kg, 2),
+        "dropped_order_ids": dropped,
+    }
+    if capacities is not None and used.any():
+        used_caps = float(np.asarray(capacities, dtype=np.float64)[used].sum())
+    else:
+        used_caps = 0.0
+    fleet["capacity_kg"] = round(used_caps, 2)
+    fleet["utilization"] = round(total_load / used_caps, 4) if used_caps > 0 else None
+
+    return {"routes": per_route, "fleet": fleet}
+
+
+def unserved_kpis(order_ids, demands_kg):
+    """KPI report for a group whose orders were not routed at all."""
+    demands_kg = np.asarray(demands_kg, dtype=np.float64)
+    return {
+        "routes": [],
+        "fleet": {
+            "vehicles_used": 0,
+            "stops": 0,
+            "distance_km": 0.0,
+            "duration_min": 0.0,
+            "emissions_kg_co2": 0.0,
+            "load_kg": 0.0,
+            "lateness_min": 0.0,
+            "late_stops": 0,
+            "dropped_orders": len(order_ids),
+            "dropped_kg": round(float(demands_kg.sum()), 2),
+            "dropped_order_ids": [str(o) for o in order_ids],
+            "capacity_kg": 0.0,
+            "utilization": None,
+        },
+    }
+
+
+def merge_kpis(reports):
+    """Combine KPI reports of independently solved route groups.
+
+    Per-route entries are concatenated in vehicle order and fleet totals are
+    summed, with utilization recomputed from the combined load and capacity.
+    """
+    if len(reports) == 1:
+        return reports[0]
+    per_route = sorted(
+        (route for report in reports for route in report["routes"]),
+        key=lambda route: route["vehicle_index"],
+    )
+    fleet = {}
+    for report in reports:
+        for key, value in report["fleet"].items():
+            if key == "utilization":
+                continue
+            if key == "dropped_order_ids":
+                fleet.setdefault(key, []).extend(value)
+            else:
+                fleet[key] = fleet.get(key, 0) + value
+    for key in ("distance_km", "emissions_kg_co2"):
+        fleet[key] = round(fleet[key], 3)
+    for key in ("duration_min", "lateness_min"):
+        fleet[key] = round(fleet[key], 1)
+    for key in ("load_kg", "dropped_kg", "capacity_kg"):
+        fleet[key] = round(fleet[key], 2)
+    caps = fleet["capacity_kg"]
+    fleet["utilization"] = round(fleet["load_kg"] / caps, 4) if caps > 0 else None
+    return {"routes": per_route, "fleet": fleet}
+
+
+def write_kpis(kpis, path):
+    """Store a KPI report as JSON next to the solution CSV."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(kpis, f, indent=2)
+    return path
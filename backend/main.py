@@ -1,4 +1,5 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from database import init_db
 from routes.user_routes import router as user_router
@@ -6,8 +7,11 @@ from routes.order_routes import router as order_router
 from routes.vehicle_routes import router as vehicle_router
 from routes.route_routes import router as route_router
 from pydantic import BaseModel
+from serialization import CompressionMiddleware, FastJSONResponse
 import or_tools
+import profiling
 import pandas as pd
+import os
 
 app = FastAPI()
 
@@ -20,6 +24,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Negotiated br/gzip compression for the large map and table payloads
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
 @app.on_event("startup")
 async def start_db():
     await init_db()
@@ -47,10 +54,11 @@ class Filters(BaseModel):
     timeWindows: bool
 
 @app.post("/run-script")
-def run_script(filters: Filters):
+def run_script(filters: Filters, profile: bool = False):
     print("Received filters:", filters.dict())
     orders = pd.read_csv("../data/orders_with_coords.csv")
     vehicles = pd.read_csv("../data/delivery_vehicles.csv")
+    depots = pd.read_csv("../data/depots.csv")
     
     # Configure weights based on filters
     cfg = {
@@ -59,6 +67,7 @@ def run_script(filters: Filters):
         "w_distance": 1.0,
         "w_emissions": 2.0 if filters.lowCarbon else 1.0,
         "w_on_time": 1.0,
+        "profile": profile,
     }
     
     # Filter vehicles based on fuel type preferences
@@ -66,13 +75,28 @@ def run_script(filters: Filters):
         # Prioritize electric vehicles
         vehicles = vehicles.sort_values('fuel_type', key=lambda x: x.map({'electric': 0, 'hybrid': 1, 'diesel': 2, 'gasoline': 3}))
     
-    sol = or_tools.solve_routes(orders, vehicles, cfg)
+    sol = or_tools.solve_routes(orders, vehicles, cfg, depots_df=depots)
+
+    report = sol.get("profile")
+    if report:
+        report["download_url"] = f"/run-script/profile/{report['profile_id']}"
     
     # Return the solution with routes
-    return {
+    return FastJSONResponse({
         "status": sol.get("status", "error"), 
         "message": "Routes optimized with filters",
         "routes": sol.get("routes", []),
+        "kpis": sol.get("kpis"),
+        "profile": report,
         "filters_applied": filters.dict()
-    }
+    })
+
+@app.get("/run-script/profile/{profile_id}")
+def download_profile(profile_id: str, fmt: str = Query("speedscope", alias="format")):
+    """Download a solve profile as speedscope JSON or a raw pstats dump."""
+    path = profiling.artifact_path(profile_id, fmt)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "application/json" if fmt == "speedscope" else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=os.path.basename(path))
 
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import Optional
 
 class Vehicle(BaseModel):
     vehicle_id: str
@@ -6,6 +7,7 @@ class Vehicle(BaseModel):
     max_capacity_kg: int
     fuel_type: str
     emission_g_co2_per_km: int
+    depot_id: Optional[str] = None
     
     class Config:
         json_schema_extra = {
@@ -14,6 +16,7 @@ class Vehicle(BaseModel):
                 "type": "truck",
                 "max_capacity_kg": 7319,
                 "fuel_type": "diesel",
-                "emission_g_co2_per_km": 300
+                "emission_g_co2_per_km": 300,
+                "depot_id": "D001"
             }
         }
\ No newline at end of file
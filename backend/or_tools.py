@@ -4,6 +4,14 @@ import pandas as pd
 import csv
 from copy import deepcopy
 import numpy as np
+import os
+import multiprocessing
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import kpi
+import profiling
 
 def haversine_km(lat1, lon1, lat2, lon2):
     # approximate radius of earth in km
@@ -15,33 +23,201 @@ def haversine_km(lat1, lon1, lat2, lon2):
     return R * c
 
 
+def build_distance_matrix(lats, lons):
+    """Vectorised haversine distance matrix in metres."""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * 6371.0 * 1000.0 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
 def build_time_matrix(orders_df, speed_kmh=30):
-    n = len(orders_df)
-    matrix = [[0] * n for _ in range(n)]
-    for i in range(n):
-        for j in range(n):
-            if i == j:
-                matrix[i][j] = 0
-            else:
-                d_km = haversine_km(
-                    orders_df.loc[i, "lat"],
-                    orders_df.loc[i, "lon"],
-                    orders_df.loc[j, "lat"],
-                    orders_df.loc[j, "lon"],
-                )
-                # convert distance to minutes with a simple fixed speed
-                time_hours = d_km / speed_kmh
-                matrix[i][j] = int(time_hours * 60)  # minutes as integer
+    d_km = build_distance_matrix(orders_df["lat"], orders_df["lon"]) / 1000.0
+    # convert distance to minutes with a simple fixed speed
+    time_hours = d_km / speed_kmh
+    return (time_hours * 60).astype(int)  # minutes as integer
+
+
+def to_minutes(t):
+    if pd.isna(t) or t == "":
+        return None
+    parts = str(t).split(":")
+    try:
+        h, m = map(int, parts[:2])
+    except Exception:
+        return None
+    return h * 60 + m
+
+
+# Fallback depot used when no depots table is supplied
+DEFAULT_DEPOT = {
+    "depot_id": "D001",
+    "name": "Ljubljana",
+    "lat": 46.0506713158607,
+    "lon": 14.459560361232214,
+}
+
+# Precomputed road distances; node 0 is DEFAULT_DEPOT, node i is order row i - 1
+DIST_MATRIX_PATH = "../data/dist_matrix.npy"
+
+# Worker pool shared by multi-depot solves across requests
+_group_pool = None
+_group_pool_workers = None
+_group_pool_lock = threading.Lock()
+
+
+def get_group_pool(workers):
+    """Shared process pool for depot groups, rebuilt when its size changes.
+
+    Workers are spawned rather than forked, which is safe from inside a
+    threaded server, and reusing the pool keeps interpreter start-up off
+    the per-request path.
+    """
+    global _group_pool, _group_pool_workers
+    with _group_pool_lock:
+        if _group_pool is None or _group_pool_workers != workers:
+            if _group_pool is not None:
+                _group_pool.shutdown(wait=False)
+            _group_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _group_pool_workers = workers
+        return _group_pool
+
+
+def _discard_group_pool(pool):
+    global _group_pool
+    with _group_pool_lock:
+        if _group_pool is pool:
+            _group_pool = None
+    pool.shutdown(wait=False)
+
+
+def load_distance_matrix(nodes):
+    """Distance matrix (metres) for the given node table.
+
+    Arcs between nodes the precomputed road matrix covers (via the
+    `matrix_node` column) use road distances. Only rows and columns of
+    uncovered nodes, such as extra depots, fall back to haversine.
+    """
+    matrix_nodes = nodes.get("matrix_node")
+    if matrix_nodes is None or not os.path.exists(DIST_MATRIX_PATH):
+        return build_distance_matrix(nodes["lat"], nodes["lon"])
+    full = np.load(DIST_MATRIX_PATH, mmap_mode="r")
+    idx = matrix_nodes.to_numpy(dtype=np.float64)
+    covered = ~np.isnan(idx) & (np.nan_to_num(idx, nan=-1) < full.shape[0])
+    if covered.all():
+        cov_idx = idx.astype(int)
+        return np.asarray(full[np.ix_(cov_idx, cov_idx)])
+    matrix = build_distance_matrix(nodes["lat"], nodes["lon"])
+    if covered.any():
+        cov_pos = np.flatnonzero(covered)
+        cov_idx = idx[covered].astype(int)
+        matrix[np.ix_(cov_pos, cov_pos)] = full[np.ix_(cov_idx, cov_idx)]
     return matrix
 
 
-def solve_routes(orders_df, vehicles_df, config=None):
+def assign_orders_to_depots(orders, depots, vehicles, strategy="proximity", contested_margin_km=0.0):
+    """Assign every order to a home depot.
+
+    strategy: 'proximity' picks the nearest depot; 'capacity' walks orders by
+        regret (distance to runner-up minus distance to nearest) and picks the
+        nearest depot whose fleet still has capacity left, falling back to
+        the nearest one.
+    Returns: (assigned, runner_up, contested) arrays indexed like `orders`.
+        An order is contested when its runner-up depot is within
+        `contested_margin_km` of the assigned one.
+    """
+    dist_km = build_distance_matrix(
+        np.concatenate([orders["lat"].to_numpy(), depots["lat"].to_numpy()]),
+        np.concatenate([orders["lon"].to_numpy(), depots["lon"].to_numpy()]),
+    )[: len(orders), len(orders):] / 1000.0
+
+    # Depots without vehicles cannot serve anything
+    fleet_caps = np.array([
+        vehicles.loc[vehicles["depot_id"] == d, "max_capacity_kg"].sum()
+        for d in depots["depot_id"]
+    ], dtype=np.float64)
+    dist_km[:, fleet_caps <= 0] = np.inf
+
+    ranked = np.argsort(dist_km, axis=1)
+    assigned = ranked[:, 0].copy()
+
+    if strategy == "capacity":
+        rows = np.arange(len(orders))
+        if len(depots) > 1:
+            regret = dist_km[rows, ranked[:, 1]] - dist_km[rows, ranked[:, 0]]
+        else:
+            regret = np.zeros(len(orders))
+        remaining = fleet_caps.copy()
+        weights = orders["Weight(kg)"].fillna(0).to_numpy(dtype=np.float64)
+        for i in np.argsort(-regret, kind="stable"):
+            for d in ranked[i]:
+                if remaining[d] >= weights[i]:
+                    assigned[i] = d
+                    break
+            remaining[assigned[i]] -= weights[i]
+
+    if len(depots) > 1:
+        # Runner-up is the nearest depot other than the assigned one
+        masked = dist_km.copy()
+        masked[np.arange(len(orders)), assigned] = np.inf
+        runner_up = np.argmin(masked, axis=1)
+        gap = masked[np.arange(len(orders)), runner_up] - dist_km[np.arange(len(orders)), assigned]
+        contested = np.abs(gap) <= contested_margin_km
+    else:
+        runner_up = assigned.copy()
+        contested = np.zeros(len(orders), dtype=bool)
+    return assigned, runner_up, contested
+
+
+def _depot_id_str(value):
+    """Normalise a depot id read by pandas (e.g. 1.0 from a column with blanks)."""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _depot_groups(n_depots, pairs, max_size=2):
+    """Union depots linked by contested orders into joint groups.
+
+    Depot pairs are merged strongest link first (most contested orders
+    shared) and only while the merged group stays within `max_size`
+    depots, so a few borderline orders cannot chain every hub into one
+    model. Contested orders of pairs left apart stay with their assigned
+    depot.
+    """
+    parent = list(range(n_depots))
+    size = [1] * n_depots
+
+    def find(d):
+        while parent[d] != d:
+            parent[d] = parent[parent[d]]
+            d = parent[d]
+        return d
+
+    links = Counter((min(a, b), max(a, b)) for a, b in pairs if a != b)
+    for (a, b), _count in sorted(links.items(), key=lambda item: (-item[1], item[0])):
+        ra, rb = find(a), find(b)
+        if ra != rb and size[ra] + size[rb] <= max_size:
+            parent[ra] = rb
+            size[rb] += size[ra]
+    groups = {}
+    for d in range(n_depots):
+        groups.setdefault(find(d), []).append(d)
+    return list(groups.values())
+
+
+def solve_routes(orders_df, vehicles_df, config=None, depots_df=None):
     """Solve vehicle routing with capacities, time windows and flexible costs.
 
     orders_df: DataFrame containing orders. Expected columns: OrderID, Weight(kg),
         Priority, WindowStart, WindowEnd, lat, lon (and optional address fields).
     vehicles_df: DataFrame with vehicle info. Expected columns: vehicle_id,
-        max_capacity_kg, emission_g_co2_per_km
+        max_capacity_kg, emission_g_co2_per_km and optionally depot_id
+        (blank ids fall back to the first depot; unknown ids raise ValueError)
     config: dict with optional keys:
         - allow_late_deliveries (bool)
         - w_distance (float)
@@ -49,8 +225,17 @@ def solve_routes(orders_df, vehicles_df, config=None):
         - w_on_time (float)
         - speed_kmh (float)
         - time_limit_sec (int)
-        - output_path (str) -> write CSV when provided
-    Returns: dict with solution rows under 'routes' and 'status' message.
+        - depot_assignment ("proximity" | "capacity")
+        - joint_contested (bool) -> solve depots sharing contested orders jointly
+        - contested_margin_km (float) -> runner-up depot distance margin
+        - max_joint_depots (int) -> cap on depots merged into one joint model
+        - max_workers (int) -> size of the shared pool for independent depot groups
+        - profile (bool) -> attach a phase/callback/cProfile report under 'profile'
+        - profile_dir (str) -> where profile artifacts are written
+        - output_path (str) -> write CSV (and a *_kpis.json sidecar) when provided
+    depots_df: DataFrame with depot_id, lat, lon. Defaults to DEFAULT_DEPOT.
+    Returns: dict with solution rows under 'routes', KPIs under 'kpis' and
+        'status' message.
     """
 
     # Defensive copy
@@ -65,28 +250,188 @@ def solve_routes(orders_df, vehicles_df, config=None):
         "w_on_time": 1.0,
         "speed_kmh": 30,
         "time_limit_sec": 10,
+        "depot_assignment": "proximity",
+        "joint_contested": False,
+        "contested_margin_km": 1.0,
+        "max_joint_depots": 2,
+        "max_workers": None,
+        "profile": False,
+        "profile_dir": None,
         "output_path": None,
     }
     if config:
         cfg.update(config)
 
-    # Insert depot as first row if not present
-    if not ((orders.get("OrderID") == "depot").any()):
-        depot_row = {
-            "OrderID": "depot",
-            "Weight(kg)": 0,
-            "Priority": 0,
-            "WindowStart": "",
-            "WindowEnd": "",
-            "street": "",
-            "house_number": "",
-            "postal_code": "",
-            "city": "",
-            "full_address": "Depot",
-            "lat": 46.0506713158607,
-            "lon": 14.459560361232214,
-        }
-        orders = pd.concat([pd.DataFrame([depot_row]), orders], ignore_index=True)
+    # Worker processes trace their own solves; here we only time the phases
+    profiler = profiling.SolveProfiler(cfg["profile"], name="solve_routes")
+    profiler.start(trace=False)
+    profiler.mark("prepare")
+
+    # A depot row passed in with the orders overrides the default location
+    default_depot = dict(DEFAULT_DEPOT)
+    if "OrderID" in orders.columns and (orders["OrderID"] == "depot").any():
+        depot_mask = orders["OrderID"] == "depot"
+        first = orders[depot_mask].iloc[0]
+        default_depot.update(lat=first["lat"], lon=first["lon"])
+        orders = orders[~depot_mask].reset_index(drop=True)
+    orders["matrix_node"] = orders.index + 1
+
+    if depots_df is None or len(depots_df) == 0:
+        depots = pd.DataFrame([default_depot])
+        vehicles["depot_id"] = default_depot["depot_id"]
+    else:
+        depots = deepcopy(depots_df).reset_index(drop=True)
+        if "depot_id" not in vehicles.columns:
+            vehicles["depot_id"] = depots.loc[0, "depot_id"]
+        vehicles["depot_id"] = vehicles["depot_id"].fillna(depots.loc[0, "depot_id"])
+    depots["depot_id"] = depots["depot_id"].map(_depot_id_str)
+    vehicles["depot_id"] = vehicles["depot_id"].map(_depot_id_str)
+    unknown = vehicles[~vehicles["depot_id"].isin(depots["depot_id"])]
+    if not unknown.empty:
+        listed = ", ".join(f"{v} -> {d}" for v, d in zip(unknown["vehicle_id"], unknown["depot_id"]))
+        raise ValueError(f"Vehicles reference unknown depots: {listed}")
+    # Only the default depot location is covered by the precomputed matrix
+    depots["matrix_node"] = np.where(
+        np.isclose(depots["lat"], DEFAULT_DEPOT["lat"]) & np.isclose(depots["lon"], DEFAULT_DEPOT["lon"]),
+        0,
+        np.nan,
+    )
+    vehicles["vehicle_index"] = vehicles.index
+
+    profiler.mark("assign")
+    assigned, runner_up, contested = assign_orders_to_depots(
+        orders, depots, vehicles, cfg["depot_assignment"], cfg["contested_margin_km"]
+    )
+    if cfg["joint_contested"]:
+        groups = _depot_groups(
+            len(depots), zip(assigned[contested], runner_up[contested]), cfg["max_joint_depots"]
+        )
+    else:
+        groups = [[d] for d in range(len(depots))]
+
+    tasks = []
+    unserved = []
+    group_cfg = dict(cfg, output_path=None)
+    for group in groups:
+        ids = depots.loc[group, "depot_id"].tolist()
+        group_vehicles = vehicles[vehicles["depot_id"].isin(ids)]
+        group_orders = orders[np.isin(assigned, group)]
+        if group_vehicles.empty:
+            # A hub listed without a fleet yet is fine as long as nothing was sent to it
+            if len(group_orders):
+                unserved.append(group_orders)
+            continue
+        tasks.append((group_orders, group_vehicles, depots.loc[group], group_cfg))
+
+    profiler.mark("solve")
+    # Independent depot groups run in separate processes so total wall time
+    # tracks the slowest group rather than the sum of all of them
+    if len(tasks) > 1:
+        pool = get_group_pool(cfg["max_workers"] or os.cpu_count() or 1)
+        try:
+            results = list(pool.map(_solve_group, *zip(*tasks)))
+        except BrokenProcessPool:
+            # A crashed worker poisons the pool; the next solve starts a fresh one
+            _discard_group_pool(pool)
+            raise
+    else:
+        results = [_solve_group(*t) for t in tasks]
+
+    profiler.mark("merge")
+    # Orders of groups that could not be solved still count as dropped
+    for (group_orders, *_), r in zip(tasks, results):
+        if "kpis" not in r and len(group_orders):
+            unserved.append(group_orders)
+    statuses = {r["status"] for r in results}
+    if unserved:
+        statuses.add("NO_SOLUTION")
+    if statuses == {"OK"}:
+        status = "OK"
+    elif "OK" in statuses:
+        status = "PARTIAL"
+    else:
+        status = "NO_SOLUTION"
+
+    routes_rows = sorted(
+        (row for r in results for row in r["routes"]),
+        key=lambda row: (row["vehicle_index"], row["stop_index"]),
+    )
+    result = {"status": status, "routes": routes_rows}
+    reports = [r["kpis"] for r in results if "kpis" in r]
+    reports += [
+        kpi.unserved_kpis(o["OrderID"].tolist(), o["Weight(kg)"].fillna(0))
+        for o in unserved
+    ]
+    if reports:
+        result["kpis"] = kpi.merge_kpis(reports)
+
+    output_path = cfg.get("output_path")
+    if output_path and routes_rows:
+        profiler.mark("write")
+        with open(output_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(
+                f,
+                fieldnames=[
+                    "vehicle_id",
+                    "vehicle_index",
+                    "stop_index",
+                    "order_id",
+                    "demand_kg",
+                    "cumulative_load_kg",
+                    "lat",
+                    "lon",
+                    "depot_id",
+                ],
+            )
+            writer.writeheader()
+            writer.writerows(routes_rows)
+        result["output_path"] = output_path
+        if "kpis" in result:
+            kpis_path = os.path.splitext(output_path)[0] + "_kpis.json"
+            result["kpis_path"] = kpi.write_kpis(result["kpis"], kpis_path)
+
+    profiler.stop()
+    if profiler.enabled:
+        reports = [profiler.report()] + [r["profile"] for r in results if r.get("profile")]
+        result["profile"] = profiling.build_report(reports, cfg["profile_dir"])
+
+    return result
+
+
+def _solve_group(orders, vehicles, depots, cfg):
+    """Build and solve one routing model for a group of depots.
+
+    Depots become the first nodes of the model and each vehicle starts and
+    ends at its home depot. Runs in a worker process for multi-depot solves,
+    so everything passed in and returned must be picklable.
+    """
+    profiler = profiling.SolveProfiler(
+        cfg.get("profile", False), name="depots " + ",".join(depots["depot_id"])
+    )
+    profiler.start()
+    profiler.mark("matrices")
+
+    orders = orders.reset_index(drop=True)
+    vehicles = vehicles.reset_index(drop=True)
+    # Depots without vehicles in this group would only add dead nodes
+    depots = depots[depots["depot_id"].isin(vehicles["depot_id"])].reset_index(drop=True)
+
+    # Depots first, then orders
+    depot_rows = pd.DataFrame({
+        "OrderID": "depot",
+        "Weight(kg)": 0,
+        "Priority": 0,
+        "WindowStart": "",
+        "WindowEnd": "",
+        "full_address": "Depot",
+        "lat": depots["lat"],
+        "lon": depots["lon"],
+        "depot_id": depots["depot_id"],
+        "matrix_node": depots["matrix_node"],
+    })
+    orders = pd.concat([depot_rows, orders], ignore_index=True)
+    depot_node = {d: i for i, d in enumerate(depots["depot_id"])}
+    num_depots = len(depots)
 
     # Data containers
     data = {}
@@ -95,15 +440,15 @@ def solve_routes(orders_df, vehicles_df, config=None):
     data["time_matrix"] = build_time_matrix(orders, speed_kmh=cfg["speed_kmh"])
     #data["time_matrix"] = np.load("../data/dur_matrix.npy").tolist()
 
-    # Nodes & depot
+    # Nodes & depots
     data["num_vehicles"] = len(vehicles)
-    data["depot"] = 0
+    data["starts"] = [depot_node[d] for d in vehicles["depot_id"]]
 
     # Scaling to keep integers for capacities
     SCALE = 100
     data["demands"] = []
     for i, row in orders.iterrows():
-        if i == data["depot"]:
+        if i < num_depots:
             data["demands"].append(0)
         else:
             w = row.get("Weight(kg)", 0)
@@ -113,8 +458,9 @@ def solve_routes(orders_df, vehicles_df, config=None):
     data["vehicle_capacities"] = [int(round(c * SCALE)) for c in raw_caps]
 
     # Build routing model
+    profiler.mark("model")
     manager = pywrapcp.RoutingIndexManager(
-        len(data["time_matrix"]), data["num_vehicles"], data["depot"]
+        len(data["time_matrix"]), data["num_vehicles"], data["starts"], data["starts"]
     )
     routing = pywrapcp.RoutingModel(manager)
 
@@ -125,7 +471,7 @@ def solve_routes(orders_df, vehicles_df, config=None):
         # data["time_matrix"] is a numpy ndarray, index with [i, j]
         return int(data["time_matrix"][from_node, to_node])
 
-    transit_cb_index = routing.RegisterTransitCallback(time_callback)
+    transit_cb_index = routing.RegisterTransitCallback(profiler.wrap_callback("transit", time_callback))
     routing.SetArcCostEvaluatorOfAllVehicles(transit_cb_index)
 
     # Cost: per-vehicle cost callbacks combining distance and emissions
@@ -137,7 +483,9 @@ def solve_routes(orders_df, vehicles_df, config=None):
     #     for j in range(len(orders))
     # ] for i in range(len(orders))]
 
-    distance_km_matrix = np.load("../data/dist_matrix.npy")
+    # Matrices are in metres; the cost model works in km
+    distance_m_matrix = load_distance_matrix(orders)
+    distance_km_matrix = distance_m_matrix / 1000.0
 
     #distance_km_matrix = np.load("../data/dist_matrix.npy").tolist()
 
@@ -162,7 +510,9 @@ def solve_routes(orders_df, vehicles_df, config=None):
         return cost_callback
 
     for v in range(data["num_vehicles"]):
-        cb_index = routing.RegisterTransitCallback(make_cost_callback_for_vehicle(v))
+        cb_index = routing.RegisterTransitCallback(
+            profiler.wrap_callback("cost", make_cost_callback_for_vehicle(v))
+        )
         routing.SetArcCostEvaluatorOfVehicle(cb_index, v)
 
     # Capacity dimension
@@ -170,7 +520,7 @@ def solve_routes(orders_df, vehicles_df, config=None):
         from_node = manager.IndexToNode(from_index)
         return data["demands"][from_node]
 
-    demand_cb_index = routing.RegisterUnaryTransitCallback(demand_callback)
+    demand_cb_index = routing.RegisterUnaryTransitCallback(profiler.wrap_callback("demand", demand_callback))
     routing.AddDimensionWithVehicleCapacity(
         demand_cb_index,
         0,
@@ -189,21 +539,10 @@ def solve_routes(orders_df, vehicles_df, config=None):
     )
     time_dimension = routing.GetDimensionOrDie("Time")
 
-    # Time-window helpers
-    def to_minutes(t):
-        if pd.isna(t) or t == "":
-            return None
-        parts = str(t).split(":")
-        try:
-            h, m = map(int, parts[:2])
-        except Exception:
-            return None
-        return h * 60 + m
-
     LATE_PENALTY_PER_MIN = int(cfg["w_on_time"])
 
     for node_index, row in orders.iterrows():
-        if node_index == data["depot"]:
+        if node_index < num_depots:
             continue
         index = manager.NodeToIndex(node_index)
         start = to_minutes(row.get("WindowStart", ""))
@@ -216,7 +555,7 @@ def solve_routes(orders_df, vehicles_df, config=None):
 
     # Priority/disjunctions
     for node_index, row in orders.iterrows():
-        if node_index == data["depot"]:
+        if node_index < num_depots:
             continue
         index = manager.NodeToIndex(node_index)
         priority = str(row.get("Priority", "")).strip().lower()
@@ -238,9 +577,12 @@ def solve_routes(orders_df, vehicles_df, config=None):
     )
     search_params.time_limit.FromSeconds(int(cfg.get("time_limit_sec", 10)))
 
+    profiler.mark("search")
     solution = routing.SolveWithParameters(search_params)
+    profiler.mark("extract")
 
     routes_rows = []
+    route_nodes = []
     if solution:
         for v in range(data["num_vehicles"]):
             veh_row = vehicles.iloc[v]
@@ -250,8 +592,10 @@ def solve_routes(orders_df, vehicles_df, config=None):
             index = routing.Start(v)
             route_load = 0
             stop_idx = 0
+            nodes = []
             while not routing.IsEnd(index):
                 node_index = manager.IndexToNode(index)
+                nodes.append(node_index)
                 order_id = orders.loc[node_index, "OrderID"]
                 demand_units = data["demands"][node_index]
                 route_load += demand_units
@@ -260,41 +604,47 @@ def solve_routes(orders_df, vehicles_df, config=None):
 
                 routes_rows.append({
                     "vehicle_id": veh_id,
-                    "vehicle_index": v,
+                    "vehicle_index": int(veh_row["vehicle_index"]),
                     "stop_index": stop_idx,
                     "order_id": order_id,
                     "demand_kg": f"{demand_kg:.2f}",
                     "cumulative_load_kg": f"{load_kg:.2f}",
                     "lat": orders.loc[node_index, "lat"],
                     "lon": orders.loc[node_index, "lon"],
+                    "depot_id": veh_row["depot_id"],
                 })
 
                 index = solution.Value(routing.NextVar(index))
                 stop_idx += 1
+            route_nodes.append(nodes)
     print(routes_rows)
 
     result = {"status": "OK" if solution else "NO_SOLUTION", "routes": routes_rows}
 
-    output_path = cfg.get("output_path")
-    if output_path and routes_rows:
-        with open(output_path, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(
-                f,
-                fieldnames=[
-                    "vehicle_id",
-                    "vehicle_index",
-                    "stop_index",
-                    "order_id",
-                    "demand_kg",
-                    "cumulative_load_kg",
-                    "lat",
-                    "lon",
-                ],
-            )
-            writer.writeheader()
-            writer.writerows(routes_rows)
-        result["output_path"] = output_path
-
+    if solution:
+        profiler.mark("kpis")
+        windows = [
+            (to_minutes(row.get("WindowStart", "")), to_minutes(row.get("WindowEnd", "")))
+            for _, row in orders.iterrows()
+        ]
+        result["kpis"] = kpi.evaluate_routes(
+            route_nodes,
+            distance_m_matrix,
+            data["time_matrix"],
+            vehicle_ids=vehicles["vehicle_id"].tolist(),
+            order_ids=orders["OrderID"].tolist(),
+            demands=np.asarray(data["demands"]) / SCALE,
+            capacities=raw_caps,
+            emission_factors=vehicle_emissions,
+            window_start=[np.nan if s is None else s for s, _ in windows],
+            window_end=[np.nan if e is None else e for _, e in windows],
+        )
+        for route in result["kpis"]["routes"]:
+            route["vehicle_index"] = int(vehicles.loc[route["vehicle_index"], "vehicle_index"])
+
+    profiler.stop()
+    if profiler.enabled:
+        result["profile"] = profiler.report()
     return result
 
 
@@ -302,8 +652,9 @@ if __name__ == "__main__":
     # Script-style runner for quick testing
     orders = pd.read_csv("../data/orders_with_coords.csv")
     vehicles = pd.read_csv("../data/delivery_vehicles.csv")
+    depots = pd.read_csv("../data/depots.csv")
     cfg = {"output_path": "../data/routes_solution.csv", "time_limit_sec": 10}
-    sol = solve_routes(orders, vehicles, cfg)
+    sol = solve_routes(orders, vehicles, cfg, depots_df=depots)
     print(sol.get("status"))
     if sol.get("output_path"):
         print(f"Solution saved to {sol['output_path']}")
@@ -0,0 +1,319 @@
+import cProfile
+import glob
+import json
+import os
+import pstats
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+
+# Where profile artifacts are written unless cfg["profile_dir"] says otherwise
+DEFAULT_PROFILE_DIR = os.path.join(tempfile.gettempdir(), "optipot_profiles")
+
+# Number of most recent profiles kept in the profile dir; older ones are pruned
+PROFILE_RETENTION = 20
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+ARTIFACT_SUFFIXES = {"speedscope": ".speedscope.json", "pstats": ".prof"}
+
+
+class SolveProfiler:
+    """Per-solve profiling: phase timeline, callback counters and cProfile.
+
+    When tracing, a fresh cProfile runs for each phase so the call graph
+    can be attributed to the phase it happened in.
+
+    A disabled profiler is a no-op: `wrap_callback` hands the callback back
+    unchanged and `mark` / `start` / `stop` return immediately, so solves
+    that do not ask for profiling pay nothing inside the search loop.
+    """
+
+    def __init__(self, enabled=False, name="solve"):
+        self.enabled = enabled
+        self.name = name
+        self.phases = []
+        self.phase_stats = {}
+        self.callbacks = {}
+        self._t0 = None
+        self._current = None
+        self._trace = False
+        self._cprofile = None
+
+    def start(self, trace=True):
+        if not self.enabled:
+            return
+        self._t0 = time.perf_counter()
+        self._trace = trace
+
+    def mark(self, phase):
+        """Close the running phase (if any) and open `phase`."""
+        if not self.enabled:
+            return
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.create_stats()
+            self.phase_stats[self._current[0]] = self._cprofile.stats
+            self._cprofile = None
+        now = round(time.perf_counter() - self._t0, 6)
+        if self._current is not None:
+            self.phases.append({"name": self._current[0], "start": self._current[1], "end": now})
+        self._current = (phase, now)
+        if self._trace and phase is not None:
+            self._cprofile = cProfile.Profile()
+            try:
+                self._cprofile.enable()
+            except ValueError:
+                # Another profiler is already active (e.g. a concurrent solve)
+                self._cprofile = None
+                self._trace = False
+
+    def stop(self):
+        if not self.enabled:
+            return
+        self.mark(None)
+        self._current = None
+
+    def wrap_callback(self, kind, fn):
+        """Count calls and cumulative time of an OR-Tools Python callback."""
+        if not self.enabled:
+            return fn
+        stats = self.callbacks.setdefault(kind, {"calls": 0, "total_sec": 0.0})
+        clock = time.perf_counter
+
+        def wrapped(*args):
+            t = clock()
+            try:
+                return fn(*args)
+            finally:
+                stats["calls"] += 1
+                stats["total_sec"] += clock() - t
+
+        return wrapped
+
+    def report(self):
+        """Picklable summary, including raw cProfile stats per phase."""
+        if not self.enabled:
+            return None
+        return {
+            "name": self.name,
+            "phases": self.phases,
+            "callbacks": self.callbacks,
+            "phase_stats": self.phase_stats,
+        }
+
+
+def merge_callbacks(reports):
+    totals = {}
+    for report in reports:
+        for kind, stats in report["callbacks"].items():
+            agg = totals.setdefault(kind, {"calls": 0, "total_sec": 0.0})
+            agg["calls"] += stats["calls"]
+            agg["total_sec"] += stats["total_sec"]
+    for stats in totals.values():
+        stats["mean_us"] = stats["total_sec"] / stats["calls"] * 1e6 if stats["calls"] else 0.0
+        stats["total_sec"] = round(stats["total_sec"], 6)
+        stats["mean_us"] = round(stats["mean_us"], 3)
+    return totals
+
+
+def merge_stats(reports):
+    """Combine every phase's raw stats into one pstats.Stats, or None."""
+    # Start from an empty Stats: add() merges into the receiver in place and
+    # the raw dicts are still needed afterwards for the speedscope file
+    merged = pstats.Stats()
+    found = False
+    for report in reports:
+        for raw in report.get("phase_stats", {}).values():
+            if not raw:
+                continue
+            part = pstats.Stats()
+            part.stats = raw
+            part.get_top_level_stats()
+            merged.add(part)
+            found = True
+    return merged if found else None
+
+
+def top_functions(stats, limit=25):
+    """Hottest functions of a pstats.Stats object by cumulative time."""
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, _callers) in stats.stats.items():
+        rows.append({
+            "function": func,
+            "file": filename,
+            "line": line,
+            "calls": nc,
+            "tottime_sec": round(tt, 6),
+            "cumtime_sec": round(ct, 6),
+        })
+    rows.sort(key=lambda row: row["cumtime_sec"], reverse=True)
+    return rows[:limit]
+
+
+def _call_stacks(raw, min_weight=1e-4, max_depth=64, max_stacks=20000):
+    """Unfold a cProfile call graph into weighted stacks.
+
+    Each caller->callee edge carries the callee's time spent under that
+    caller; it is scaled by the share of the caller's own cumulative time
+    reached along the current path. Weights are self time in seconds.
+    Recursion is cut at the first repeat, and branches lighter than
+    `min_weight` are pruned.
+    """
+    callees = defaultdict(dict)
+    for callee, (_cc, _nc, _tt, _ct, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees[caller][callee] = edge
+    roots = [func for func, stat in raw.items() if not stat[4]]
+
+    stacks = []
+
+    def walk(func, path, ct_budget, tt_budget):
+        if len(stacks) >= max_stacks:
+            return
+        if tt_budget > 0:
+            stacks.append((path, tt_budget))
+        total_ct = raw[func][3]
+        if total_ct <= 0 or len(path) >= max_depth:
+            return
+        scale = ct_budget / total_ct
+        for callee, edge in callees[func].items():
+            if callee in path or callee not in raw:
+                continue
+            edge_ct = edge[3] * scale
+            if edge_ct < min_weight:
+                continue
+            walk(callee, path + (callee,), edge_ct, edge[2] * scale)
+
+    for root in roots:
+        walk(root, (root,), raw[root][3], raw[root][2])
+    return stacks
+
+
+def _frame_name(func):
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def to_speedscope(reports, name):
+    """Render reports as speedscope sampled profiles, one per report.
+
+    Phases are the outer frames; beneath each one sits the call graph its
+    cProfile trace recorded. Phase time the trace did not cover (or all of
+    it, when the phase was not traced) is attributed to the phase itself.
+    """
+    frames = []
+    frame_index = {}
+
+    def frame(key, entry):
+        if key not in frame_index:
+            frame_index[key] = len(frames)
+            frames.append(entry)
+        return frame_index[key]
+
+    profiles = []
+    for report in reports:
+        samples = []
+        weights = []
+        for phase in report["phases"]:
+            phase_frame = frame(("phase", phase["name"]), {"name": phase["name"]})
+            duration = max(phase["end"] - phase["start"], 0.0)
+            traced = 0.0
+            raw = report.get("phase_stats", {}).get(phase["name"])
+            if raw:
+                for path, weight in _call_stacks(raw):
+                    stack = [phase_frame] + [
+                        frame(func, {"name": _frame_name(func), "file": func[0], "line": func[1]})
+                        for func in path
+                    ]
+                    samples.append(stack)
+                    weights.append(weight)
+                    traced += weight
+            if duration > traced:
+                samples.append([phase_frame])
+                weights.append(duration - traced)
+        profiles.append({
+            "type": "sampled",
+            "name": report["name"],
+            "unit": "seconds",
+            "startValue": 0.0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        })
+    return {
+        "$schema": SPEEDSCOPE_SCHEMA,
+        "name": name,
+        "exporter": "optipot",
+        "shared": {"frames": frames},
+        "profiles": profiles,
+    }
+
+
+def prune_artifacts(profile_dir, keep=PROFILE_RETENTION):
+    """Delete all but the `keep` most recent profiles in `profile_dir`."""
+    newest = {}
+    for suffix in ARTIFACT_SUFFIXES.values():
+        for path in glob.glob(os.path.join(profile_dir, "*" + suffix)):
+            profile_id = os.path.basename(path)[: -len(suffix)]
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            newest[profile_id] = max(newest.get(profile_id, 0.0), mtime)
+    stale = sorted(newest, key=newest.get, reverse=True)[keep:]
+    for profile_id in stale:
+        for suffix in ARTIFACT_SUFFIXES.values():
+            try:
+                os.remove(os.path.join(profile_dir, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def build_report(reports, profile_dir=None, keep=PROFILE_RETENTION):
+    """Merge per-group reports into one artifact set and summary.
+
+    Writes `<profile_id>.speedscope.json` and, when cProfile traces were
+    captured, a merged `<profile_id>.prof` into `profile_dir`, then prunes
+    the directory down to the `keep` most recent profiles.
+    Returns: JSON-serialisable summary including the profile_id.
+    """
+    profile_dir = profile_dir or DEFAULT_PROFILE_DIR
+    os.makedirs(profile_dir, exist_ok=True)
+    profile_id = uuid.uuid4().hex
+
+    functions = []
+    try:
+        stats = merge_stats(reports)
+        if stats is not None:
+            stats.dump_stats(os.path.join(profile_dir, profile_id + ARTIFACT_SUFFIXES["pstats"]))
+            functions = top_functions(stats)
+
+        speedscope_path = os.path.join(profile_dir, profile_id + ARTIFACT_SUFFIXES["speedscope"])
+        with open(speedscope_path, "w", encoding="utf-8") as f:
+            json.dump(to_speedscope(reports, f"solve {profile_id}"), f)
+    finally:
+        # Prune even when writing failed so a run of errors cannot fill the dir
+        prune_artifacts(profile_dir, keep)
+
+    return {
+        "profile_id": profile_id,
+        "phases": {r["name"]: r["phases"] for r in reports},
+        "callbacks": merge_callbacks(reports),
+        "functions": functions,
+    }
+
+
+def artifact_path(profile_id, fmt="speedscope", profile_dir=None):
+    """Path of a stored profile artifact, or None if it does not exist."""
+    # profile ids are uuid4 hex strings; anything else could escape the dir
+    if len(profile_id) != 32 or any(c not in "0123456789abcdef" for c in profile_id):
+        return None
+    suffix = ARTIFACT_SUFFIXES.get(fmt)
+    if suffix is None:
+        return None
+    path = os.path.join(profile_dir or DEFAULT_PROFILE_DIR, profile_id + suffix)
+    return path if os.path.exists(path) else None
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from typing import List
 from models.order import Order
+from serialization import FastJSONResponse
 from controllers.order_controller import OrderController
 
 router = APIRouter(
@@ -14,7 +15,8 @@ async def get_all_orders():
     """
     Get all orders from the CSV file
     """
-    return OrderController.get_all_orders()
+    orders = OrderController.get_all_orders()
+    return FastJSONResponse([order.model_dump() for order in orders])
 
 @router.get("/{order_id}", response_model=Order)
 async def get_order_by_id(order_id: str):
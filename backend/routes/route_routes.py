@@ -1,5 +1,6 @@
 from fastapi import APIRouter
 from controllers.route_controller import RouteController
+from serialization import FastJSONResponse
 
 router = APIRouter(
     prefix="/routes",
@@ -10,4 +11,4 @@ router = APIRouter(
 @router.get("/", response_model=dict)
 async def get_routes_geojson():
     """Return routes as a GeoJSON FeatureCollection."""
-    return RouteController.get_routes_geojson()
+    return FastJSONResponse(RouteController.get_routes_geojson())
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from typing import List
 from models.vehicle import Vehicle
+from serialization import FastJSONResponse
 from controllers.vehicle_controller import VehicleController
 
 router = APIRouter(
@@ -14,7 +15,8 @@ async def get_all_vehicles():
     """
     Get all vehicles from the CSV file
     """
-    return VehicleController.get_all_vehicles()
+    vehicles = VehicleController.get_all_vehicles()
+    return FastJSONResponse([vehicle.model_dump() for vehicle in vehicles])
 
 @router.get("/{vehicle_id}", response_model=Vehicle)
 async def get_vehicle_by_id(vehicle_id: str):
@@ -0,0 +1,165 @@
+import gzip
+import json
+import math
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _default(obj):
+    # Solver output carries NumPy scalars and arrays (lat/lon, KPI values)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _finite(obj):
+    """Copy of `obj` with NaN / Infinity floats replaced by None, as orjson does."""
+    if isinstance(obj, (np.generic, np.ndarray)):
+        obj = _default(obj)
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    return obj
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson when it is installed.
+
+    Return an instance directly from a route to skip FastAPI's
+    jsonable_encoder / response_model pass for trusted internal data.
+    """
+
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(
+                content,
+                default=_default,
+                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+            )
+        options = dict(default=_default, ensure_ascii=False, separators=(",", ":"), allow_nan=False)
+        try:
+            text = json.dumps(content, **options)
+        except ValueError:
+            # Only pay for the copy when the content actually holds NaN / Infinity
+            text = json.dumps(_finite(content), **options)
+        return text.encode("utf-8")
+
+
+def _accepted_encodings(header: str) -> dict:
+    """Parse an Accept-Encoding header into {encoding: q-value}."""
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(header: str):
+    """Pick the best supported content coding the client accepts, or None."""
+    accepted = _accepted_encodings(header or "")
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for name in supported:
+        q = accepted.get(name, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with br or gzip.
+
+    The coding is negotiated from Accept-Encoding (br needs the optional
+    `brotli` package). Single-message bodies below `minimum_size`, already
+    encoded responses and streamed responses are passed through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] != "http.response.body":
+                # e.g. http.response.pathsend or trailers: nothing to compress,
+                # but the client still needs the status line and headers first
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            response_headers = [(k.lower(), v) for k, v in start_message.get("headers", [])]
+            already_encoded = any(k == b"content-encoding" for k, _ in response_headers)
+            if message.get("more_body", False) or already_encoded or len(body) < self.minimum_size:
+                # Streaming or not worth compressing: replay as-is
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            if encoding == "br":
+                body = brotli.compress(body, quality=self.brotli_quality)
+            else:
+                body = gzip.compress(body, compresslevel=self.gzip_level)
+
+            response_headers = [(k, v) for k, v in response_headers if k not in (b"content-length", b"vary")]
+            vary = [v for k, v in start_message.get("headers", []) if k.lower() == b"vary"]
+            vary_value = b", ".join(vary + [b"Accept-Encoding"])
+            response_headers += [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"vary", vary_value),
+            ]
+            passthrough = True
+            await send({**start_message, "headers": response_headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
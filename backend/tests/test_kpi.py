@@ -0,0 +1,81 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import kpi
+
+# Depot 0 and three orders on a line, 1 km apart
+DIST = np.array([
+    [0, 1000, 2000, 3000],
+    [1000, 0, 1000, 2000],
+    [2000, 1000, 0, 1000],
+    [3000, 2000, 1000, 0],
+], dtype=float)
+TIME = DIST / 1000.0 * 10  # 10 minutes per km
+DEMANDS = np.array([0.0, 5.0, 10.0, 20.0])
+
+
+def test_distance_includes_return_leg():
+    arrays = kpi.route_kpi_arrays([[0, 1, 2], [0, 3]], DIST, TIME, demands=DEMANDS)
+    assert arrays["distance_km"] == pytest.approx([4.0, 6.0])
+    assert arrays["stops"].tolist() == [2, 1]
+    assert arrays["load_kg"] == pytest.approx([15.0, 20.0])
+
+
+def test_emissions_and_utilization():
+    arrays = kpi.route_kpi_arrays(
+        [[0, 1, 2]], DIST, TIME, demands=DEMANDS, capacities=[30.0], emission_factors=[250.0]
+    )
+    assert arrays["emissions_kg_co2"] == pytest.approx([1.0])
+    assert arrays["utilization"] == pytest.approx([0.5])
+
+
+def test_lateness_waits_for_window_and_counts_overdue_stops():
+    nan = np.nan
+    window_start = np.array([nan, 100.0, nan, nan])
+    window_end = np.array([nan, 120.0, 105.0, nan])
+    arrays = kpi.route_kpi_arrays(
+        [[0, 1, 2]], DIST, TIME, window_start=window_start, window_end=window_end
+    )
+    # Leave at 90 to reach stop 1 at 100, then stop 2 at 110: 5 minutes late
+    assert arrays["lateness_min"] == pytest.approx([5.0])
+    assert arrays["late_stops"].tolist() == [1]
+    assert arrays["duration_min"] == pytest.approx([40.0])
+
+
+def test_dropped_orders_reported():
+    report = kpi.evaluate_routes(
+        [[0, 1], [0]], DIST, TIME, order_ids=["depot", "A", "B", "C"], demands=DEMANDS
+    )
+    fleet = report["fleet"]
+    assert fleet["dropped_order_ids"] == ["B", "C"]
+    assert fleet["dropped_kg"] == pytest.approx(30.0)
+    assert fleet["vehicles_used"] == 1
+
+
+def test_plan_kpi_arrays_matches_per_plan_evaluation():
+    plans = [
+        [[0, 1, 2, 3], [0]],
+        [[0, 3], [0, 1]],
+        [[0, 2], [0, 3, 1]],
+    ]
+    routes = [route for plan in plans for route in plan]
+    plan_ids = np.repeat(np.arange(len(plans)), 2)
+    caps = [40.0, 25.0]
+    batch = kpi.plan_kpi_arrays(
+        routes, plan_ids, DIST, TIME, demands=DEMANDS,
+        capacities=np.tile(caps, len(plans)), emission_factors=np.tile([100.0, 0.0], len(plans)),
+    )
+    for p, plan in enumerate(plans):
+        fleet = kpi.evaluate_routes(
+            plan, DIST, TIME, demands=DEMANDS, capacities=caps, emission_factors=[100.0, 0.0]
+        )["fleet"]
+        assert batch["distance_km"][p] == pytest.approx(fleet["distance_km"])
+        assert batch["emissions_kg_co2"][p] == pytest.approx(fleet["emissions_kg_co2"])
+        assert batch["dropped_orders"][p] == fleet["dropped_orders"]
+        assert batch["dropped_kg"][p] == pytest.approx(fleet["dropped_kg"])
+        assert batch["vehicles_used"][p] == fleet["vehicles_used"]
+        assert batch["utilization"][p] == pytest.approx(fleet["utilization"], abs=1e-4)
@@ -0,0 +1,125 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import or_tools
+
+# Two hubs about 8 km apart and orders clustered around each of them
+DEPOTS = pd.DataFrame({
+    "depot_id": ["D001", "D002"],
+    "lat": [46.05, 46.05],
+    "lon": [14.45, 14.55],
+})
+
+
+def make_orders(points, weight=10.0):
+    return pd.DataFrame({
+        "OrderID": [f"ORD{i:04d}" for i in range(1, len(points) + 1)],
+        "Weight(kg)": weight,
+        "Priority": "urgent",
+        "WindowStart": "",
+        "WindowEnd": "",
+        "full_address": "",
+        "lat": [lat for lat, _ in points],
+        "lon": [lon for _, lon in points],
+    })
+
+
+def make_vehicles(depot_ids, capacity=100.0):
+    return pd.DataFrame({
+        "vehicle_id": [f"V{i:03d}" for i in range(1, len(depot_ids) + 1)],
+        "max_capacity_kg": capacity,
+        "emission_g_co2_per_km": 1,
+        "depot_id": depot_ids,
+    })
+
+
+@pytest.fixture
+def no_road_matrix(monkeypatch, tmp_path):
+    monkeypatch.setattr(or_tools, "DIST_MATRIX_PATH", str(tmp_path / "missing.npy"))
+
+
+def test_depot_groups_respects_max_size():
+    pairs = [(0, 1)] * 3 + [(1, 2)] * 2 + [(2, 3)]
+    groups = or_tools._depot_groups(4, pairs, max_size=2)
+    assert sorted(map(sorted, groups)) == [[0, 1], [2, 3]]
+
+
+def test_depot_groups_do_not_chain():
+    # 0-1 and 1-2 are both contested, but merging them all would exceed the cap
+    groups = or_tools._depot_groups(3, [(0, 1), (0, 1), (1, 2)], max_size=2)
+    assert sorted(map(sorted, groups)) == [[0, 1], [2]]
+    assert or_tools._depot_groups(3, [(0, 1), (1, 2)], max_size=3) == [[0, 1, 2]]
+
+
+def test_assign_proximity_picks_nearest_depot():
+    orders = make_orders([(46.05, 14.46), (46.05, 14.54)])
+    vehicles = make_vehicles(["D001", "D002"])
+    assigned, runner_up, contested = or_tools.assign_orders_to_depots(orders, DEPOTS, vehicles)
+    assert assigned.tolist() == [0, 1]
+    assert runner_up.tolist() == [1, 0]
+    assert not contested.any()
+
+
+def test_assign_capacity_spills_to_next_depot():
+    orders = make_orders([(46.05, 14.46), (46.05, 14.47)], weight=60.0)
+    vehicles = make_vehicles(["D001", "D002"])
+    proximity, _, _ = or_tools.assign_orders_to_depots(orders, DEPOTS, vehicles, "proximity")
+    capacity, _, _ = or_tools.assign_orders_to_depots(orders, DEPOTS, vehicles, "capacity")
+    assert proximity.tolist() == [0, 0]
+    # D001 holds 100 kg, so one of the two 60 kg orders moves to D002
+    assert sorted(capacity.tolist()) == [0, 1]
+
+
+def test_assign_skips_depots_without_vehicles():
+    orders = make_orders([(46.05, 14.46), (46.05, 14.54)])
+    vehicles = make_vehicles(["D001"])
+    assigned, _, _ = or_tools.assign_orders_to_depots(orders, DEPOTS, vehicles)
+    assert assigned.tolist() == [0, 0]
+
+
+def test_load_distance_matrix_keeps_road_distances_for_covered_nodes(monkeypatch, tmp_path):
+    road = np.array([[0, 111, 222], [111, 0, 333], [222, 333, 0]], dtype=float)
+    path = tmp_path / "dist_matrix.npy"
+    np.save(path, road)
+    monkeypatch.setattr(or_tools, "DIST_MATRIX_PATH", str(path))
+    nodes = pd.DataFrame({
+        "lat": [46.05, 46.06, 46.07, 46.08],
+        "lon": [14.45, 14.46, 14.47, 14.48],
+        "matrix_node": [np.nan, 0, 2, 1],
+    })
+    matrix = or_tools.load_distance_matrix(nodes)
+    assert matrix[1:, 1:] == pytest.approx(road[np.ix_([0, 2, 1], [0, 2, 1])])
+    haversine = or_tools.build_distance_matrix(nodes["lat"], nodes["lon"])
+    assert matrix[0] == pytest.approx(haversine[0])
+    assert matrix[:, 0] == pytest.approx(haversine[:, 0])
+
+
+def test_solve_routes_rejects_unknown_depot_ids():
+    orders = make_orders([(46.05, 14.46)])
+    vehicles = make_vehicles(["D001", "D009"])
+    with pytest.raises(ValueError, match="V002 -> D009"):
+        or_tools.solve_routes(orders, vehicles, {"time_limit_sec": 1}, depots_df=DEPOTS)
+
+
+def test_solve_routes_normalises_float_depot_ids(no_road_matrix):
+    orders = make_orders([(46.05, 14.46), (46.06, 14.45)])
+    vehicles = make_vehicles([1.0, None])
+    depots = pd.DataFrame({"depot_id": [1], "lat": [46.05], "lon": [14.45]})
+    result = or_tools.solve_routes(orders, vehicles, {"time_limit_sec": 1}, depots_df=depots)
+    assert result["status"] == "OK"
+    assert {row["depot_id"] for row in result["routes"]} == {"1"}
+
+
+def test_solve_routes_ignores_depots_without_fleet_or_orders(no_road_matrix):
+    orders = make_orders([(46.05, 14.46), (46.06, 14.45), (46.04, 14.44)])
+    vehicles = make_vehicles(["D001", "D001"])
+    result = or_tools.solve_routes(orders, vehicles, {"time_limit_sec": 1}, depots_df=DEPOTS)
+    assert result["status"] == "OK"
+    assert result["kpis"]["fleet"]["dropped_orders"] == 0
+    served = {row["order_id"] for row in result["routes"]} - {"depot"}
+    assert served == set(orders["OrderID"])
@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import profiling
+
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+
+def make_report():
+    profiler = profiling.SolveProfiler(True, name="depots D001")
+    profiler.start()
+    profiler.mark("model")
+    callback = profiler.wrap_callback("transit", busy)
+    for _ in range(50):
+        callback(2000)
+    profiler.mark("search")
+    time.sleep(0.01)
+    profiler.stop()
+    return profiler.report()
+
+
+def test_disabled_profiler_returns_callback_unchanged():
+    profiler = profiling.SolveProfiler(False)
+    profiler.start()
+    profiler.mark("model")
+    assert profiler.wrap_callback("transit", busy) is busy
+    profiler.stop()
+    assert profiler.report() is None
+
+
+def test_enabled_profiler_counts_callbacks_and_phases():
+    report = make_report()
+    assert [p["name"] for p in report["phases"]] == ["model", "search"]
+    assert report["callbacks"]["transit"]["calls"] == 50
+    assert set(report["phase_stats"]) == {"model", "search"}
+
+
+@pytest.mark.parametrize("profile_id", ["abc", "../" + "a" * 29, "A" * 32, "g" * 32])
+def test_artifact_path_rejects_bad_ids(tmp_path, profile_id):
+    assert profiling.artifact_path(profile_id, profile_dir=str(tmp_path)) is None
+
+
+def test_artifact_path_rejects_unknown_formats(tmp_path):
+    profile_id = "a" * 32
+    (tmp_path / (profile_id + ".speedscope.json")).write_text("{}")
+    assert profiling.artifact_path(profile_id, "speedscope", str(tmp_path)) is not None
+    assert profiling.artifact_path(profile_id, "html", str(tmp_path)) is None
+
+
+def test_prune_artifacts_keeps_most_recent_profiles(tmp_path):
+    ids = [f"{i:032x}" for i in range(5)]
+    for i, profile_id in enumerate(ids):
+        for suffix in profiling.ARTIFACT_SUFFIXES.values():
+            path = tmp_path / (profile_id + suffix)
+            path.write_text("")
+            os.utime(path, (1000 + i, 1000 + i))
+    profiling.prune_artifacts(str(tmp_path), keep=2)
+    remaining = {name.split(".")[0] for name in os.listdir(tmp_path)}
+    assert remaining == set(ids[-2:])
+    assert len(os.listdir(tmp_path)) == 2 * len(profiling.ARTIFACT_SUFFIXES)
+
+
+def test_to_speedscope_is_consistent():
+    reports = [make_report(), make_report()]
+    document = profiling.to_speedscope(reports, "solve")
+    n_frames = len(document["shared"]["frames"])
+    assert len(document["profiles"]) == 2
+    for profile in document["profiles"]:
+        assert profile["endValue"] == pytest.approx(sum(profile["weights"]))
+        assert len(profile["samples"]) == len(profile["weights"])
+        for stack in profile["samples"]:
+            assert all(0 <= i < n_frames for i in stack)
+            # Phases are always the outermost frame
+            assert document["shared"]["frames"][stack[0]]["name"] in ("model", "search")
+
+
+def test_build_report_writes_artifacts(tmp_path):
+    summary = profiling.build_report([make_report()], str(tmp_path))
+    for fmt in profiling.ARTIFACT_SUFFIXES:
+        assert profiling.artifact_path(summary["profile_id"], fmt, str(tmp_path)) is not None
+    assert summary["callbacks"]["transit"]["calls"] == 50
+    assert any(row["function"] == "busy" for row in summary["functions"])
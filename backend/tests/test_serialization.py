@@ -0,0 +1,104 @@
+import asyncio
+import gzip
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import serialization
+from serialization import CompressionMiddleware, FastJSONResponse, choose_encoding
+
+BIG = {"rows": [{"order_id": f"ORD{i:04d}", "lat": 46.05, "lon": 14.46} for i in range(200)]}
+
+
+@pytest.fixture
+def no_brotli(monkeypatch):
+    monkeypatch.setattr(serialization, "brotli", None)
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/big")
+    def big():
+        return FastJSONResponse(BIG, headers={"Vary": "Origin"})
+
+    @app.get("/small")
+    def small():
+        return FastJSONResponse({"ok": True})
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"x" * 500, b"y" * 500]), media_type="text/plain")
+
+    @app.get("/encoded")
+    def encoded():
+        return Response(gzip.compress(b"z" * 500), headers={"Content-Encoding": "gzip"})
+
+    return TestClient(app)
+
+
+def test_choose_encoding_prefers_highest_q_value():
+    assert choose_encoding("gzip;q=0.9, br;q=0.5") == "gzip"
+    assert choose_encoding("gzip;q=0.5, br;q=0.8") == ("br" if serialization.brotli else "gzip")
+
+
+def test_choose_encoding_wildcard_and_refusals(no_brotli):
+    assert choose_encoding("*") == "gzip"
+    assert choose_encoding("gzip;q=0, *") is None
+    assert choose_encoding("br") is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("") is None
+
+
+def test_middleware_compresses_large_bodies_and_merges_vary(client, no_brotli):
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Origin, Accept-Encoding"
+    assert response.json() == BIG
+
+
+@pytest.mark.parametrize("path", ["/small", "/stream"])
+def test_middleware_passes_small_and_streamed_bodies_through(client, path):
+    response = client.get(path, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def test_middleware_leaves_encoded_bodies_alone(client):
+    response = client.get("/encoded", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == b"z" * 500
+
+
+def test_middleware_sends_start_before_non_body_messages():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.pathsend", "path": "/tmp/profile.prof"})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message["type"])
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(app)(scope, None, send))
+    assert sent == ["http.response.start", "http.response.pathsend"]
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_fast_json_response_writes_nan_as_null(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson not installed")
+    content = {"value": float("nan"), "kpis": np.array([np.inf, 2.0]), "n": np.int64(3)}
+    body = FastJSONResponse(content).body
+    assert json.loads(body) == {"value": None, "kpis": [None, 2.0], "n": 3}